@@ -11,38 +11,156 @@ Features:
 
 import os
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
 import time
+import atexit
+import random
 import logging
-from datetime import datetime, timedelta
+import bisect
+from datetime import datetime, timedelta, timezone
 import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 import pickle
-import pytz
+import tempfile
+from zoneinfo import ZoneInfo
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Static wedding information, shared by the popup buttons and the text commands
+INFO_CONTENT = {
+    "venue": """🏛️ Park Royal Marina
+📍 6 Raffles Blvd, Singapore 039594, Level 5 Atrium Ballroom
+🚗 Marina Square parking (coupons available)""",
+
+    "schedule": """📅 27 Sep 2025
+🍸 6:30 PM Cocktail
+🍽️ 7:15 PM To be Seated
+🎉 11:00 PM Afterparty @ OSG Suntec""",
+
+    "transport": """🚇 MRT: Esplanade Station (4 min walk)
+🚗 Taxi: Park Royal Marina Hotel Lobby
+🅿️ Marina Square parking (coupons available)
+📍 Afterparty @OSG Suntec: Postal Code 038983
+""",
+
+    "menu": """🍽️ 8-Course Chinese Menu / Halal Menu
+🥂 Cocktail: Canapés + free flow drinks
+🍾 Drinks: Free flow beer, wine, and soft drinks""",
+
+    "contact": """📞 CONTACTS
+👰 Jaz: @jaztww
+🤵 Paul: @ywp_88
+👧 Ching Yee (OIC): @chingyljy
+👦 Samuel (2IC): @butterandink
+""",
+
+    "help": """8️⃣8️⃣8️⃣ Bring $2 or $10 notes for lucky draw! The more you bring, the more ballots you have ;) 
+"""
+}
+
+# Group welcome broadcast every 25 new members
+MILESTONE_WELCOME_TEXT = """🎉 **Welcome to Paul and Jaz's wedding group!**
+
+We're so excited to celebrate with all of you on **27 September 2025**.
+
+💡 Click any button below for wedding information:
+
+*Use `/start` anytime to see these buttons again!*"""
+
+
+def _pytz_tzinfo(zone, utcoffset=None, *args):
+    """Stand-in for pytz's unpickle helper: the exact stored offset, else the named zone."""
+    if utcoffset is not None:
+        return timezone(timedelta(seconds=utcoffset))
+    return ZoneInfo(zone)
+
+
+class _LegacyScheduleUnpickler(pickle.Unpickler):
+    """Read the old pickled schedule without pytz installed."""
+    
+    def find_class(self, module, name):
+        if module == 'pytz' and name == '_p':
+            return _pytz_tzinfo
+        if module == 'pytz' and name == '_UTC':
+            return lambda: timezone.utc
+        return super().find_class(module, name)
+
 
 class InlineWeddingBot:
+    # Only the update kinds the bot handles, encoded once for getUpdates
+    ALLOWED_UPDATES = orjson.dumps(["message", "callback_query"]).decode()
+    UPDATES_LIMIT = 100
+    MAX_RATE_LIMIT_RETRIES = 3
+    DISPATCH_WORKERS = 8
+    BROADCAST_WORKERS = 2
+    JSON_HEADERS = {"Content-Type": "application/json"}
+    INFO_COMMANDS = frozenset(INFO_CONTENT)
+    
     def __init__(self):
         self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
         self.group_chat_id = os.getenv('TELEGRAM_GROUP_CHAT_ID')
         
         if not self.bot_token or not self.group_chat_id:
             raise ValueError("Environment variables TELEGRAM_BOT_TOKEN and TELEGRAM_GROUP_CHAT_ID are required")
+        
+        # Numeric copy for cheap comparisons against incoming chat ids
+        try:
+            self.group_chat_id_int = int(self.group_chat_id)
+        except ValueError:
+            raise ValueError("TELEGRAM_GROUP_CHAT_ID must be a numeric chat id")
             
         self.base_url = f"https://api.telegram.org/bot{self.bot_token}"
+        
+        # Endpoint URLs are built once instead of on every request
+        self._send_url = f"{self.base_url}/sendMessage"
+        self._cb_url = f"{self.base_url}/answerCallbackQuery"
+        self._upd_url = f"{self.base_url}/getUpdates"
+        
+        # Shared HTTP session so every call reuses the keep-alive connection to Telegram.
+        # One pooled connection per thread that talks to Telegram: the dispatch and
+        # broadcast workers plus the poll loop and the scheduler thread.
+        self.http = requests.Session()
+        self.http.mount("https://", HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=self.DISPATCH_WORKERS + self.BROADCAST_WORKERS + 2,
+            # 429s are retried in _request using Telegram's own retry_after
+            max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
+        ))
+        
+        # Last acknowledged update. The saved copy is only a hint for skipping the batch
+        # Telegram redelivers after a restart; polling itself starts without an offset.
+        self.offset_file = ".wedding_offset"
+        self.offset_save_every = 10  # Updates between offset writes
         self.last_update_id = 0
+        self._resume_after = self.load_offset()
+        self._saved_update_id = self._resume_after
+        self.drop_pending = os.getenv('DROP_PENDING', '0') == '1'  # Skip queued backlog at startup
+        
         self.member_count = 0  # Track number of members who have joined
+        self._member_lock = threading.Lock()
+        
+        # Updates in a batch are handled in parallel so their replies don't wait on each other
+        self._pool = ThreadPoolExecutor(max_workers=self.DISPATCH_WORKERS, thread_name_prefix="dispatch")
+        # Group-wide broadcasts get their own workers so they never hold up update handling
+        self._broadcast_pool = ThreadPoolExecutor(max_workers=self.BROADCAST_WORKERS, thread_name_prefix="broadcast")
         
         # Timezone settings - Singapore Time (UTC+8)
-        self.singapore_tz = pytz.timezone('Asia/Singapore')
+        self.singapore_tz = ZoneInfo('Asia/Singapore')
         
         # Scheduled message settings with persistence
-        self.schedule_file = "wedding_schedule.pkl"
+        self.schedule_file = "wedding_schedule.json"
+        self.legacy_schedule_file = "wedding_schedule.pkl"
+        self._dirty = False  # Set when the in-memory schedule differs from the file
+        self._schedule_lock = threading.Lock()
         self.scheduled_messages = self.load_schedule()
         self.remove_duplicate_schedules()  # Clean up any duplicates
         self.schedule_initialized = self.check_if_schedule_exists()
+        self.schedule_check_interval = 30  # Seconds between scheduled message checks
+        self._stop_event = threading.Event()
+        atexit.register(self._flush_if_dirty)
         
         # Welcome message with buttons
         self.welcome_keyboard = {
@@ -62,8 +180,40 @@ class InlineWeddingBot:
             ]
         }
         
+        # Text commands map straight to bound handlers
+        self._cmd_dispatch = {"start": self._cmd_start, **{c: self._cmd_info for c in self.INFO_COMMANDS}}
+        
+        # The milestone welcome never changes, so its sendMessage body is encoded once
+        self._welcome_body = orjson.dumps({
+            "chat_id": self.group_chat_id,
+            "text": MILESTONE_WELCOME_TEXT,
+            "parse_mode": "Markdown",
+            "reply_markup": orjson.dumps(self.welcome_keyboard).decode()
+        })
+        
+        # Popup answers are static, so build their request bodies once
+        self._cb_bodies = {
+            info_type: {"text": self._truncate(text), "show_alert": True}
+            for info_type, text in INFO_CONTENT.items()
+        }
+        
         logger.info(f"Inline Wedding Bot initialized for group: {self.group_chat_id}")
     
+    def _request(self, method, url, **kwargs):
+        """Make a Telegram API call, waiting out 429 rate limits as instructed."""
+        for attempt in range(self.MAX_RATE_LIMIT_RETRIES + 1):
+            response = self.http.request(method, url, **kwargs)
+            if response.status_code != 429 or attempt == self.MAX_RATE_LIMIT_RETRIES:
+                return response
+            
+            try:
+                retry_after = orjson.loads(response.content)['parameters']['retry_after']
+            except Exception:
+                retry_after = 1
+            delay = retry_after + random.uniform(0, 1)
+            logger.warning(f"⏳ Rate limited by Telegram, retrying in {delay:.1f}s")
+            time.sleep(delay)
+    
     def send_message(self, chat_id, text, reply_markup=None, reply_to_message_id=None, parse_mode="Markdown"):
         """Send a message with optional inline keyboard."""
         try:
@@ -74,34 +224,41 @@ class InlineWeddingBot:
             }
             
             if reply_markup:
-                params["reply_markup"] = json.dumps(reply_markup)
+                params["reply_markup"] = orjson.dumps(reply_markup).decode()
             if reply_to_message_id:
                 params["reply_to_message_id"] = reply_to_message_id
             
-            response = requests.post(f"{self.base_url}/sendMessage", json=params, timeout=30)
-            return response.status_code == 200 and response.json().get('ok', False)
+            return self._post_message(orjson.dumps(params))
+        except Exception as e:
+            logger.error(f"❌ Error sending message: {e}")
+            return False
+    
+    def _post_message(self, body):
+        """Post an already-encoded sendMessage body."""
+        try:
+            response = self._request("POST", self._send_url, data=body, headers=self.JSON_HEADERS, timeout=30)
+            return response.status_code == 200 and orjson.loads(response.content).get('ok', False)
         except Exception as e:
             logger.error(f"❌ Error sending message: {e}")
             return False
     
     def answer_callback_query(self, callback_query_id, text, show_alert=True):
-        """Answer callback query with popup message visible only to the user."""
+        """Answer callback query with popup message visible only to the user (text must fit the 200 char limit)."""
+        params = {
+            "callback_query_id": callback_query_id,
+            "text": text,
+            "show_alert": show_alert  # Shows as popup dialog
+        }
+        
+        return self._post_callback_answer(params)
+    
+    def _post_callback_answer(self, params):
+        """Post a prepared answerCallbackQuery body."""
         try:
-            # Ensure text is not too long (Telegram limit is ~200 characters)
-            if len(text) > 200:
-                text = text[:197] + "..."
-                logger.warning(f"⚠️ Truncated callback text to 200 chars")
-            
-            params = {
-                "callback_query_id": callback_query_id,
-                "text": text,
-                "show_alert": show_alert  # Shows as popup dialog
-            }
-            
-            response = requests.post(f"{self.base_url}/answerCallbackQuery", json=params, timeout=10)
+            response = self._request("POST", self._cb_url, data=orjson.dumps(params), headers=self.JSON_HEADERS, timeout=10)
             
             if response.status_code == 200:
-                result = response.json()
+                result = orjson.loads(response.content)
                 if result.get('ok'):
                     logger.info(f"✅ Callback answered successfully")
                     return True
@@ -116,19 +273,41 @@ class InlineWeddingBot:
             logger.error(f"❌ Error answering callback: {e}")
             return False
     
+    @staticmethod
+    def _truncate(text, limit=200):
+        """Shorten text to Telegram's popup limit (~200 characters), once at startup."""
+        if len(text) > limit:
+            return text[:limit - 3] + "..."
+        return text
+    
     def get_updates(self, offset=None, timeout=30):
         """Get updates from Telegram."""
         try:
-            params = {"timeout": timeout}
+            params = {
+                "timeout": timeout,
+                "limit": self.UPDATES_LIMIT,
+                "allowed_updates": self.ALLOWED_UPDATES
+            }
             if offset:
                 params["offset"] = offset
             
-            response = requests.get(f"{self.base_url}/getUpdates", params=params, timeout=timeout+5)
+            response = self._request("GET", self._upd_url, params=params, timeout=timeout+5)
             
             if response.status_code == 200:
-                result = response.json()
-                if result['ok']:
-                    return result['result']
+                result = orjson.loads(response.content)
+                if isinstance(result, dict) and result.get('ok') and isinstance(result.get('result'), list):
+                    # Drop anything without a usable update_id so offset math stays sound
+                    updates = [
+                        update for update in result['result']
+                        if isinstance(update, dict)
+                        and isinstance(update.get('update_id'), int)
+                        and not isinstance(update['update_id'], bool)
+                    ]
+                    if result['result'] and not updates:
+                        # Nothing to acknowledge, so the same payload would come straight back
+                        logger.warning(f"⚠️ Got {len(result['result'])} updates without a usable update_id, backing off")
+                        time.sleep(5 + random.random() * 2)
+                    return updates
             return []
         except requests.exceptions.Timeout:
             return []
@@ -136,40 +315,34 @@ class InlineWeddingBot:
             logger.error(f"❌ Error getting updates: {e}")
             return []
     
+    @staticmethod
+    def _is_valid_callback_query(callback_query):
+        """Check the callback query fields the bot reads have the expected types."""
+        return (
+            isinstance(callback_query, dict)
+            and isinstance(callback_query.get('id'), str)
+            and isinstance(callback_query.get('data'), str)
+            and isinstance(callback_query.get('from'), dict)
+        )
+    
+    @staticmethod
+    def _is_valid_message(message):
+        """Check the message fields the bot reads have the expected types."""
+        if not isinstance(message, dict):
+            return False
+        chat = message.get('chat')
+        if not isinstance(chat, dict) or not isinstance(chat.get('id'), int):
+            return False
+        if not isinstance(message.get('message_id'), int) or not isinstance(message.get('from', {}), dict):
+            return False
+        if not isinstance(message.get('text', ''), str):
+            return False
+        members = message.get('new_chat_members', [])
+        return isinstance(members, list) and all(isinstance(member, dict) for member in members)
+    
     def get_info_content(self, info_type):
         """Get formatted content for different information types (shortened for popup - max 200 chars)."""
-        content = {
-            "venue": """🏛️ Park Royal Marina
-📍 6 Raffles Blvd, Singapore 039594, Level 5 Atrium Ballroom
-🚗 Marina Square parking (coupons available)""",
-
-            "schedule": """📅 27 Sep 2025
-🍸 6:30 PM Cocktail
-🍽️ 7:15 PM To be Seated
-🎉 11:00 PM Afterparty @ OSG Suntec""",
-
-            "transport": """🚇 MRT: Esplanade Station (4 min walk)
-🚗 Taxi: Park Royal Marina Hotel Lobby
-🅿️ Marina Square parking (coupons available)
-📍 Afterparty @OSG Suntec: Postal Code 038983
-""",
-
-            "menu": """🍽️ 8-Course Chinese Menu / Halal Menu
-🥂 Cocktail: Canapés + free flow drinks
-🍾 Drinks: Free flow beer, wine, and soft drinks""",
-
-            "contact": """📞 CONTACTS
-👰 Jaz: @jaztww
-🤵 Paul: @ywp_88
-👧 Ching Yee (OIC): @chingyljy
-👦 Samuel (2IC): @butterandink
-""",
-
-            "help": """8️⃣8️⃣8️⃣ Bring $2 or $10 notes for lucky draw! The more you bring, the more ballots you have ;) 
-"""
-        }
-        
-        return content.get(info_type, "Information not available.")
+        return INFO_CONTENT.get(info_type, "Information not available.")
     
     def handle_callback_query(self, callback_query):
         """Handle inline keyboard button presses with popup responses."""
@@ -180,13 +353,10 @@ class InlineWeddingBot:
         
         logger.info(f"🔘 {user_name} requested: {data}")
         
-        if data in ["venue", "schedule", "transport", "menu", "contact", "help"]:
-            # Get information content
-            content = self.get_info_content(data)
-            logger.info(f"📝 Content length for {data}: {len(content)} characters")
-            
+        body = self._cb_bodies.get(data)
+        if body:
             # Send as popup notification (only visible to the user who clicked)
-            success = self.answer_callback_query(query_id, content, show_alert=True)
+            success = self._post_callback_answer({"callback_query_id": query_id, **body})
             if not success:
                 # Fallback: send a simple acknowledgment
                 self.answer_callback_query(query_id, f"✅ {data.title()} info sent!", show_alert=False)
@@ -198,12 +368,9 @@ class InlineWeddingBot:
         """Handle text-based commands with replies."""
         text = message.get('text', '').lower().strip()
         chat_id = message['chat']['id']
-        message_id = message['message_id']
-        user = message['from']
-        user_name = user.get('first_name', 'Guest')
         
         # Only respond to commands in the wedding group
-        if str(chat_id) != str(self.group_chat_id):
+        if chat_id != self.group_chat_id_int:
             return
         
         if not text.startswith('/'):
@@ -211,25 +378,30 @@ class InlineWeddingBot:
         
         command = text[1:]  # Remove the '/'
         
-        if command in ["venue", "schedule", "transport", "menu", "contact", "help"]:
-            content = self.get_info_content(command)
-            
-            # Send response as reply to the user's message
-            self.send_message(chat_id, content, reply_to_message_id=message_id)
-            logger.info(f"📝 Responded to /{command} from {user_name}")
+        handler = self._cmd_dispatch.get(command)
+        if handler:
+            handler(message, command)
+    
+    def _cmd_info(self, message, command):
+        """Reply to an information command such as /venue."""
+        content = self.get_info_content(command)
         
-        elif command == "start":
-            # Show welcome message with buttons
-            welcome_text = f"""Welcome to Paul and Jaz's wedding group! 👋
+        # Send response as reply to the user's message
+        self.send_message(message['chat']['id'], content, reply_to_message_id=message['message_id'])
+        logger.info(f"📝 Responded to /{command} from {message.get('from', {}).get('first_name', 'Guest')}")
+    
+    def _cmd_start(self, message, command):
+        """Show the welcome message with buttons."""
+        welcome_text = f"""Welcome to Paul and Jaz's wedding group! 👋
 
 Here's all the wedding information for **Paul & Jaz's Wedding** on **27 September 2025**.
 
 💡 Click any button below for instant information!
 
 """
-            
-            self.send_message(chat_id, welcome_text, self.welcome_keyboard, reply_to_message_id=message_id)
-            logger.info(f"📝 Sent welcome message to {user_name}")
+        
+        self.send_message(message['chat']['id'], welcome_text, self.welcome_keyboard, reply_to_message_id=message['message_id'])
+        logger.info(f"📝 Sent welcome message to {message.get('from', {}).get('first_name', 'Guest')}")
     
     def process_new_members(self, message):
         """Track new members and send welcome message every 25 users."""
@@ -244,49 +416,133 @@ Here's all the wedding information for **Paul & Jaz's Wedding** on **27 Septembe
                 username = member.get('username', '')
                 
                 # Increment member count
-                self.member_count += 1
+                with self._member_lock:
+                    self.member_count += 1
+                    member_count = self.member_count
                 
-                logger.info(f"👋 New member joined: {member_name} (@{username}) - Total count: {self.member_count}")
+                logger.info(f"👋 New member joined: {member_name} (@{username}) - Total count: {member_count}")
                 
                 # Send welcome message every 25 members
-                if self.member_count % 25 == 0:
-                    welcome_text = f"""🎉 **Welcome to Paul and Jaz's wedding group!**
-
-We're so excited to celebrate with all of you on **27 September 2025**.
-
-💡 Click any button below for wedding information:
-
-*Use `/start` anytime to see these buttons again!*"""
+                if member_count % 25 == 0:
+                    self._broadcast_pool.submit(self._post_message, self._welcome_body)
                     
-                    self.send_message(
-                        chat_id=self.group_chat_id,
-                        text=welcome_text,
-                        reply_markup=self.welcome_keyboard
-                    )
-                    
-                    logger.info(f"📢 Sent welcome message for milestone: {self.member_count} members")
+                    logger.info(f"📢 Queued welcome message for milestone: {member_count} members")
+    
+    def load_offset(self):
+        """Load the last acknowledged update id, or 0 if none was saved."""
+        try:
+            if os.path.exists(self.offset_file):
+                with open(self.offset_file, 'rb') as f:
+                    offset = int(f.read().strip())
+                logger.info(f"📨 Last handled update before restart: {offset}")
+                return offset
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load offset file: {e}")
+        
+        return 0
+    
+    def save_offset(self, force=False):
+        """Persist last_update_id once it has advanced far enough (or always when forced)."""
+        if self.last_update_id == self._saved_update_id:
+            return
+        # Ids that move backwards (Telegram restarted its sequence) are saved straight away
+        if not force and 0 <= self.last_update_id - self._saved_update_id < self.offset_save_every:
+            return
+        
+        try:
+            self._atomic_write(self.offset_file, str(self.last_update_id).encode())
+            self._saved_update_id = self.last_update_id
+        except Exception as e:
+            logger.warning(f"⚠️ Could not save offset: {e}")
     
     def load_schedule(self):
         """Load scheduled messages from file to prevent duplicates on restart."""
         try:
             if os.path.exists(self.schedule_file):
                 with open(self.schedule_file, 'rb') as f:
-                    schedule = pickle.load(f)
+                    entries = orjson.loads(f.read())
+                schedule = []
+                for entry in entries:
+                    target_date = datetime.fromisoformat(entry['ts'])
+                    if target_date.tzinfo is None:
+                        target_date = target_date.replace(tzinfo=self.singapore_tz)
+                    schedule.append((target_date.timestamp(), entry['msg'], entry['buttons']))
                 logger.info(f"📅 Loaded {len(schedule)} scheduled messages from file")
                 return schedule
+            
+            if os.path.exists(self.legacy_schedule_file):
+                # One-shot migration from the old pickle format
+                with open(self.legacy_schedule_file, 'rb') as f:
+                    schedule = [
+                        (date.timestamp(), msg, buttons)
+                        for date, msg, buttons in _LegacyScheduleUnpickler(f).load()
+                    ]
+                self._write_schedule(schedule)
+                os.remove(self.legacy_schedule_file)
+                logger.info(f"📅 Migrated {len(schedule)} scheduled messages to {self.schedule_file}")
+                return schedule
         except Exception as e:
             logger.warning(f"⚠️ Could not load schedule file: {e}")
         
         return []
     
+    def _write_schedule(self, schedule):
+        """Atomically write the schedule as JSON next to the final file."""
+        entries = [
+            {"ts": datetime.fromtimestamp(target_ts, self.singapore_tz).isoformat(), "msg": message_text, "buttons": include_buttons}
+            for target_ts, message_text, include_buttons in schedule
+        ]
+        self._atomic_write(self.schedule_file, orjson.dumps(entries))
+    
+    @staticmethod
+    def _atomic_write(path, data):
+        """Write bytes to a temp file beside path, fsync it, then move it into place."""
+        target_dir = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile('wb', dir=target_dir, delete=False) as f:
+            try:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            except Exception:
+                f.close()
+                os.remove(f.name)
+                raise
+        try:
+            # NamedTemporaryFile creates 0600; keep the 0644 a plain open() would give
+            os.chmod(f.name, 0o644)
+            os.replace(f.name, path)
+        except Exception:
+            os.remove(f.name)
+            raise
+    
     def save_schedule(self):
         """Save scheduled messages to file."""
         try:
-            with open(self.schedule_file, 'wb') as f:
-                pickle.dump(self.scheduled_messages, f)
+            self._write_schedule(self.scheduled_messages)
             logger.debug("💾 Schedule saved to file")
+            return True
         except Exception as e:
             logger.warning(f"⚠️ Could not save schedule: {e}")
+            return False
+    
+    @staticmethod
+    def _minute_key(target_ts):
+        """Bucket a schedule timestamp by epoch minute for duplicate lookups."""
+        return int(target_ts // 60)
+    
+    def _find_schedule_near(self, target_ts):
+        """Return a scheduled timestamp within one minute of target_ts, if any."""
+        key = self._minute_key(target_ts)
+        for neighbor in (key - 1, key, key + 1):
+            existing_ts = self._sched_by_minute.get(neighbor)
+            if existing_ts is not None and abs(target_ts - existing_ts) < 60:
+                return existing_ts
+        return None
+    
+    def _index_schedule(self):
+        """Rebuild the minute index and sorted send times from scheduled_messages."""
+        self._sched_by_minute = {self._minute_key(ts): ts for ts, _, _ in self.scheduled_messages}
+        self._sched_times = [ts for ts, _, _ in self.scheduled_messages]
     
     def check_if_schedule_exists(self):
         """Check if wedding schedule has already been initialized."""
@@ -295,7 +551,7 @@ We're so excited to celebrate with all of you on **27 September 2025**.
         
         # Check if we have the expected wedding messages (3 messages for our wedding)
         # This prevents duplicates even if schedule file gets corrupted
-        wedding_date = self.singapore_tz.localize(datetime(2025, 9, 27, 8, 0))
+        wedding_date = datetime(2025, 9, 27, 8, 0, tzinfo=self.singapore_tz)
         expected_dates = [
             wedding_date - timedelta(days=7),  # 1 week before
             wedding_date - timedelta(days=1),  # 1 day before  
@@ -303,72 +559,95 @@ We're so excited to celebrate with all of you on **27 September 2025**.
         ]
         
         # Check if any of our expected dates already exist in schedule
-        existing_dates = [msg[0] for msg in self.scheduled_messages]
         for expected_date in expected_dates:
-            for existing_date in existing_dates:
-                # Compare dates (ignore microseconds and timezone representation differences)
-                if (abs((expected_date - existing_date).total_seconds()) < 60):  # Within 1 minute
-                    logger.info(f"📅 Found existing wedding schedule, preventing duplicates")
-                    return True
+            if self._find_schedule_near(expected_date.timestamp()) is not None:
+                logger.info(f"📅 Found existing wedding schedule, preventing duplicates")
+                return True
         
         return False
     
     def remove_duplicate_schedules(self):
-        """Remove any duplicate scheduled messages."""
-        if not self.scheduled_messages:
-            return
-        
+        """Remove any duplicate scheduled messages and keep the schedule sorted by date."""
+        self._sched_by_minute = {}
         unique_messages = []
-        for i, (date1, msg1, buttons1) in enumerate(self.scheduled_messages):
-            is_duplicate = False
-            for j, (date2, msg2, buttons2) in enumerate(unique_messages):
-                # Check if dates are within 1 minute of each other
-                if abs((date1 - date2).total_seconds()) < 60:
-                    is_duplicate = True
-                    logger.info(f"📅 Removing duplicate schedule: {date1}")
-                    break
+        for ts, msg, buttons in sorted(self.scheduled_messages, key=lambda item: item[0]):
+            # Skip dates within 1 minute of one already kept
+            if self._find_schedule_near(ts) is not None:
+                logger.info(f"📅 Removing duplicate schedule: {datetime.fromtimestamp(ts, self.singapore_tz)}")
+                continue
             
-            if not is_duplicate:
-                unique_messages.append((date1, msg1, buttons1))
+            self._sched_by_minute[self._minute_key(ts)] = ts
+            unique_messages.append((ts, msg, buttons))
+        
+        removed = len(self.scheduled_messages) - len(unique_messages)
+        self.scheduled_messages = unique_messages
+        self._index_schedule()
         
-        if len(unique_messages) != len(self.scheduled_messages):
-            self.scheduled_messages = unique_messages
-            self.save_schedule()
+        if removed:
+            self._dirty = True
             logger.info(f"📅 Cleaned up duplicates: {len(unique_messages)} unique messages remain")
     
     def add_scheduled_message(self, target_date, message_text, include_buttons=True):
         """Add a scheduled message to be sent on a specific date."""
+        # Stored as epoch seconds so due checks never touch timezones
+        target_ts = target_date.timestamp()
+        
         # Check for duplicates before adding
-        for existing_date, existing_msg, existing_buttons in self.scheduled_messages:
-            if (abs((target_date - existing_date).total_seconds()) < 60):  # Within 1 minute
-                logger.info(f"📅 Duplicate message detected, skipping: {target_date}")
-                return
+        if self._find_schedule_near(target_ts) is not None:
+            logger.info(f"📅 Duplicate message detected, skipping: {target_date}")
+            return
         
-        self.scheduled_messages.append((target_date, message_text, include_buttons))
-        self.save_schedule()  # Save after adding
+        # Keep the schedule sorted so due messages are always a prefix
+        index = bisect.bisect_right(self._sched_times, target_ts)
+        self.scheduled_messages.insert(index, (target_ts, message_text, include_buttons))
+        self._sched_times.insert(index, target_ts)
+        self._sched_by_minute[self._minute_key(target_ts)] = target_ts
+        self._dirty = True  # Saved on the next flush
         logger.info(f"📅 Scheduled message for {target_date}")
     
     def check_scheduled_messages(self):
         """Check and send any scheduled messages that are due."""
-        # Get current time in Singapore timezone
-        current_time = datetime.now(self.singapore_tz)
-        messages_to_remove = []
-        
-        for i, (target_date, message_text, include_buttons) in enumerate(self.scheduled_messages):
-            if current_time >= target_date:
-                # Send the scheduled message
-                keyboard = self.welcome_keyboard if include_buttons else None
-                self.send_message(self.group_chat_id, message_text, keyboard)
-                logger.info(f"📤 Sent scheduled message: {message_text[:50]}...")
-                messages_to_remove.append(i)
+        if not self.scheduled_messages:
+            return
         
-        # Remove sent messages from the schedule
-        for i in reversed(messages_to_remove):
-            self.scheduled_messages.pop(i)
+        # Everything up to the first future send time is due
+        due_count = bisect.bisect_right(self._sched_times, time.time())
+        if not due_count:
+            return
         
-        # Save updated schedule if messages were removed
-        if messages_to_remove:
-            self.save_schedule()
+        # Split into due and keep in one pass; each due message gets one send attempt
+        due = self.scheduled_messages[:due_count]
+        keep = self.scheduled_messages[due_count:]
+        for target_ts, message_text, include_buttons in due:
+            keyboard = self.welcome_keyboard if include_buttons else None
+            if self.send_message(self.group_chat_id, message_text, keyboard):
+                logger.info(f"📤 Sent scheduled message: {message_text[:50]}...")
+            else:
+                logger.warning(f"⚠️ Failed to send scheduled message, dropping it: {message_text[:50]}...")
+        
+        # Remove the due messages only after the attempt, so a crash mid-send resends them
+        with self._schedule_lock:
+            self.scheduled_messages = keep
+            self._sched_times = self._sched_times[due_count:]
+            for target_ts, _, _ in due:
+                self._sched_by_minute.pop(self._minute_key(target_ts), None)
+            self._dirty = True
+    
+    def _flush_if_dirty(self):
+        """Save the schedule once if anything changed since the last save."""
+        with self._schedule_lock:
+            if self._dirty:
+                self._dirty = not self.save_schedule()
+    
+    def _schedule_loop(self):
+        """Check scheduled messages on a fixed interval, independent of update traffic."""
+        while not self._stop_event.is_set():
+            try:
+                self.check_scheduled_messages()
+                self._flush_if_dirty()
+            except Exception as e:
+                logger.error(f"❌ Error checking scheduled messages: {e}")
+            self._stop_event.wait(self.schedule_check_interval)
     
     def schedule_wedding_reminders(self):
         """Set up common wedding-related scheduled messages (only if not already done)."""
@@ -380,7 +659,7 @@ We're so excited to celebrate with all of you on **27 September 2025**.
         logger.info(f"🌏 Using Singapore timezone (UTC+8): {self.singapore_tz}")
         
         # Wedding day (September 27, 2025) - All times in Singapore timezone
-        wedding_date = self.singapore_tz.localize(datetime(2025, 9, 27, 8, 0))  # 8 AM Singapore time
+        wedding_date = datetime(2025, 9, 27, 8, 0, tzinfo=self.singapore_tz)  # 8 AM Singapore time
         
         # 1 week before
         one_week_before = wedding_date - timedelta(days=7)
@@ -429,6 +708,65 @@ Use the buttons below for last-minute details:"""
         logger.info(f"📅 Schedule: {one_day_before.strftime('%Y-%m-%d %H:%M %Z')}")
         logger.info(f"📅 Schedule: {wedding_morning.strftime('%Y-%m-%d %H:%M %Z')}")
     
+    def _drop_pending_updates(self):
+        """Skip any queued updates by jumping the offset to the newest one."""
+        # Nothing older than the newest update gets handled, so the replay hint is moot
+        self._resume_after = 0
+        updates = self.get_updates(offset=-1, timeout=0)
+        if updates:
+            self.last_update_id = max(update['update_id'] for update in updates)
+            self.save_offset(force=True)
+            logger.info(f"⏭️ Dropped pending updates up to {self.last_update_id}")
+    
+    def _poll(self):
+        """Yield batches of updates starting after the last acknowledged update."""
+        while True:
+            offset = self.last_update_id + 1 if self.last_update_id else None
+            yield self.get_updates(offset=offset, timeout=30)
+    
+    def _skip_replayed(self, updates):
+        """Drop updates from the first batch after startup that were handled before the restart."""
+        resume_after, self._resume_after = self._resume_after, 0
+        if not resume_after or not updates:
+            return updates
+        
+        # Redelivered updates are at most one batch behind the saved id. Anything further
+        # back means Telegram started a new id sequence, so the saved id is stale.
+        if max(update['update_id'] for update in updates) <= resume_after - self.UPDATES_LIMIT:
+            logger.info(f"📨 Saved offset {resume_after} is ahead of Telegram's update ids, ignoring it")
+            return updates
+        
+        return [update for update in updates if update['update_id'] > resume_after]
+    
+    def _dispatch(self, update):
+        """Route a single update to the matching handler, skipping payloads with an unexpected shape."""
+        try:
+            # Handle callback queries (button presses)
+            if 'callback_query' in update:
+                if not self._is_valid_callback_query(update['callback_query']):
+                    logger.warning(f"⚠️ Ignoring malformed callback query in update {update['update_id']}")
+                    return
+                self.handle_callback_query(update['callback_query'])
+            
+            # Handle regular messages
+            elif 'message' in update:
+                message = update['message']
+                if not self._is_valid_message(message):
+                    logger.warning(f"⚠️ Ignoring malformed message in update {update['update_id']}")
+                    return
+                chat_id = message['chat']['id']
+                
+                # Only process messages from the wedding group
+                if chat_id == self.group_chat_id_int:
+                    # Handle new members
+                    self.process_new_members(message)
+                    
+                    # Handle text commands
+                    if 'text' in message:
+                        self.handle_text_command(message)
+        except Exception as e:
+            logger.error(f"❌ Error handling update {update.get('update_id')}: {e}")
+    
     def run_forever(self):
         """Run the inline wedding bot continuously."""
         logger.info("🤖 Starting Inline Wedding Bot...")
@@ -437,43 +775,38 @@ Use the buttons below for last-minute details:"""
         
         # Set up wedding reminder schedule
         self.schedule_wedding_reminders()
+        threading.Thread(target=self._schedule_loop, name="scheduler", daemon=True).start()
+        
+        if self.drop_pending:
+            if self.last_update_id:
+                logger.info(f"⏭️ DROP_PENDING ignored, already polling after update {self.last_update_id}")
+            else:
+                self._drop_pending_updates()
         
+        # Long-poll is its own rate limit, so there is no sleep between batches
         while True:
             try:
-                updates = self.get_updates(offset=self.last_update_id + 1, timeout=30)
-                
-                for update in updates:
-                    self.last_update_id = update['update_id']
-                    
-                    # Handle callback queries (button presses)
-                    if 'callback_query' in update:
-                        self.handle_callback_query(update['callback_query'])
+                for updates in self._poll():
+                    pending = self._skip_replayed(updates)
+                    if not updates:
+                        continue
                     
-                    # Handle regular messages
-                    elif 'message' in update:
-                        message = update['message']
-                        chat_id = message['chat']['id']
-                        
-                        # Only process messages from the wedding group
-                        if str(chat_id) == str(self.group_chat_id):
-                            # Handle new members
-                            self.process_new_members(message)
-                            
-                            # Handle text commands
-                            if 'text' in message:
-                                self.handle_text_command(message)
-                
-                # Check for scheduled messages every loop
-                self.check_scheduled_messages()
-                
-                time.sleep(1)
+                    # Handle the whole batch in parallel, then acknowledge it
+                    wait([self._pool.submit(self._dispatch, update) for update in pending])
+                    # Ack the highest id seen, whatever order the batch arrived in
+                    self.last_update_id = max(update['update_id'] for update in updates)
+                    self.save_offset()
                 
             except KeyboardInterrupt:
                 logger.info("🛑 Bot stopped by user")
+                self._stop_event.set()
+                self._pool.shutdown(wait=True)
+                self._broadcast_pool.shutdown(wait=True)
+                self.save_offset(force=True)
                 break
             except Exception as e:
                 logger.error(f"❌ Bot error: {e}")
-                time.sleep(5)
+                time.sleep(5 + random.random() * 2)  # Back off with jitter
 
 
 def main():